@@ -1,10 +1,16 @@
 import os
+import hashlib
 import logging
+import threading
+import orjson
+from cachetools import TTLCache
 from flask import Flask, jsonify, request, Response, stream_with_context
-from flask_cors import CORS
+from flask.json.provider import JSONProvider
 from dotenv import load_dotenv
+from asgiref.wsgi import WsgiToAsgi
 
-from utils.background_check import rs, face_search_formatted, deep_search, analyze_with_claude
+from utils.background_check import rs, face_search_formatted, deep_search, analyze_with_claude, analyze_with_claude_stream, analyze_with_claude_batch
+from utils.validation import RsRequest, SearchForm, AnalyzeForm, BatchPrompts, ValidationError, first_error
 
 # Load environment variables
 load_dotenv()
@@ -16,12 +22,174 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson, which serializes the large
+    deep-search payloads several times faster than stdlib json.
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+class CORSMiddleware:
+    """
+    WSGI middleware that appends a precomputed, static set of CORS headers
+    to every response and short-circuits preflight OPTIONS requests,
+    replacing flask-cors' per-response origin recomputation.
+    """
+    _CORS_HEADERS = [
+        ('Access-Control-Allow-Origin', '*'),
+        ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
+        ('Access-Control-Allow-Headers', 'Content-Type, Authorization'),
+        ('Access-Control-Max-Age', '3600'),
+    ]
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'OPTIONS':
+            # Answer preflight directly without entering Flask routing
+            start_response('204 No Content', self._CORS_HEADERS + [('Content-Length', '0')])
+            return [b'']
+
+        def cors_start_response(status, headers, exc_info=None):
+            return start_response(status, list(headers) + self._CORS_HEADERS, exc_info)
+
+        return self.wsgi_app(environ, cors_start_response)
+
 app = Flask(__name__)
-CORS(app)
+app.json = OrjsonProvider(app)
+app.wsgi_app = CORSMiddleware(app.wsgi_app)
 
 # Production configuration
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file upload
 
+# Supported image upload formats, built once instead of per request
+ALLOWED_EXTENSIONS = frozenset(('png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'))
+
+def allowed_file(filename):
+    """Check whether an uploaded filename has a supported image extension."""
+    i = filename.rfind('.')
+    return i >= 0 and filename[i + 1:].lower() in ALLOWED_EXTENSIONS
+
+# In-process cache of endpoint responses keyed by the request inputs
+# (text query / image SHA-256 / prompt). Repeated identical requests skip
+# the external Google/FaceCheck/Gemini/Claude calls entirely.
+_response_cache = TTLCache(maxsize=512, ttl=3600)
+_response_cache_lock = threading.Lock()
+
+def cache_get(key):
+    """Look up a cached response; returns None on miss."""
+    with _response_cache_lock:
+        return _response_cache.get(key)
+
+def cache_set(key, value):
+    """Store a response in the cache."""
+    with _response_cache_lock:
+        _response_cache[key] = value
+
+# Per-key locks so concurrent identical requests coalesce into one upstream
+# computation instead of racing past the same cache miss. The dict only ever
+# holds one small lock per distinct request shape seen by this process.
+_inflight_locks = {}
+_inflight_locks_lock = threading.Lock()
+
+def _key_lock(key):
+    """Return the shared single-flight lock for a cache key."""
+    with _inflight_locks_lock:
+        lock = _inflight_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _inflight_locks[key] = lock
+    return lock
+
+def cached_deep_search(text_query, image_data, image_hash, num_text_results):
+    """
+    Run deep_search through the response cache with single-flight locking:
+    concurrent requests for the same inputs wait for the first computation
+    to land in the cache rather than each launching their own
+    FaceCheck/CSE/Gemini fan-out (FaceCheck uploads cost paid credits).
+    """
+    deep_key = ('deep-search', text_query, image_hash, num_text_results)
+    results = cache_get(deep_key)
+    if results is not None:
+        logger.info("Deep search cache hit")
+        return results
+
+    with _key_lock(deep_key):
+        # Re-check under the lock: another request may have just finished
+        results = cache_get(deep_key)
+        if results is not None:
+            logger.info("Deep search cache hit (coalesced)")
+            return results
+
+        results = deep_search(
+            image_data=image_data,
+            text_query=text_query if text_query else None,
+            num_text_results=num_text_results
+        )
+        if "error" not in results:
+            cache_set(deep_key, results)
+        return results
+
+def read_image_upload(file, max_bytes=16 * 1024 * 1024):
+    """
+    Read an uploaded image in 64KB chunks, hashing as we go, so the size
+    check and the cache key's SHA-256 come from a single pass and an
+    oversized upload is rejected before it is fully buffered.
+
+    Returns:
+        (bytes, str): The image data and its SHA-256 hex digest.
+
+    Raises:
+        ValueError: If the upload exceeds max_bytes.
+    """
+    h = hashlib.sha256()
+    buf = bytearray()
+    while True:
+        chunk = file.read(64 * 1024)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        h.update(chunk)
+        if len(buf) > max_bytes:
+            raise ValueError(f"Image too large. Maximum size is {max_bytes // (1024 * 1024)}MB")
+    return bytes(buf), h.hexdigest()
+
+def read_image_form_field():
+    """
+    Validate and read the optional 'image' file from the current request's
+    multipart form, sharing one implementation across the search endpoints.
+
+    Returns:
+        (image_data, image_hash, error_response): data is None and hash ''
+        when no image was uploaded; error_response is a ready
+        (response, status) tuple when validation failed, else None.
+    """
+    if 'image' not in request.files:
+        return None, '', None
+
+    file = request.files['image']
+    if file.filename == '':
+        return None, '', None
+
+    # Check file type
+    if not allowed_file(file.filename):
+        return None, '', (jsonify({"error": "Invalid image file type. Supported formats: png, jpg, jpeg, gif, bmp, webp"}), 400)
+
+    try:
+        image_data, image_hash = read_image_upload(file)
+    except ValueError as size_error:
+        return None, '', (jsonify({"error": str(size_error)}), 413)
+
+    if len(image_data) == 0:
+        return None, '', (jsonify({"error": "Empty image file"}), 400)
+
+    return image_data, image_hash, None
+
 def check_environment():
     """Check that required environment variables are set"""
     required_vars = [
@@ -60,25 +228,20 @@ def health_check():
 def rs_query():
     """Text-based reverse search endpoint"""
     try:
-        # Parse & validate JSON body
+        # Parse & validate JSON body in one schema pass
         payload = request.get_json(silent=True)
-        if not payload or "text" not in payload:
+        if not payload:
             return jsonify({"error": "Request JSON must include 'text'"}), 400
 
-        text = payload["text"]
-        num_results = payload.get("num_results", 10)
-        
-        # Validate input
-        if not text.strip():
-            return jsonify({"error": "Text query cannot be empty"}), 400
-        
-        if num_results > 20:  # Rate limiting
-            num_results = 20
+        try:
+            req = RsRequest.model_validate(payload)
+        except ValidationError as validation_error:
+            return jsonify({"error": first_error(validation_error)}), 400
+
+        logger.info(f"Text search request: '{req.text[:50]}...' ({req.num_results} results)")
 
-        logger.info(f"Text search request: '{text[:50]}...' ({num_results} results)")
-        
         # Call search function
-        results = rs(text, num_results=num_results)
+        results = rs(req.text, num_results=req.num_results)
         
         logger.info(f"Text search completed: {len(results)} results found")
         return jsonify({"results": results}), 200
@@ -100,22 +263,32 @@ def face_search_query():
             return jsonify({"error": "No image file selected"}), 400
         
         # Check file type
-        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
-        if not ('.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions):
+        if not allowed_file(file.filename):
             return jsonify({"error": "Invalid file type. Supported formats: png, jpg, jpeg, gif, bmp, webp"}), 400
         
         logger.info(f"Face search request: {file.filename}")
-        
-        # Read the image data
-        image_data = file.read()
-        
-        # Validate file size (already handled by MAX_CONTENT_LENGTH, but good to check)
+
+        # Read the image data in chunks, hashing as we go (stricter 8MB cap
+        # for face search - FaceCheck rejects larger uploads anyway)
+        try:
+            image_data, image_hash = read_image_upload(file, max_bytes=8 * 1024 * 1024)
+        except ValueError as size_error:
+            return jsonify({"error": str(size_error)}), 413
+
         if len(image_data) == 0:
             return jsonify({"error": "Empty image file"}), 400
-        
+
+        # Short-circuit repeat searches for the same image
+        cache_key = ('face-search', image_hash)
+        cached = cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Face search cache hit for image {image_hash[:12]}")
+            return jsonify(cached), 200
+
         # Perform face search
         results = face_search_formatted(image_data)
-        
+
+        cache_set(cache_key, {"results": results})
         logger.info(f"Face search completed: {len(results)} results found")
         return jsonify({"results": results}), 200
         
@@ -130,41 +303,30 @@ def deep_search_endpoint():
     then provides detailed summaries of all found pages.
     """
     try:
-        # Get text query if provided
-        text_query = request.form.get('text', '').strip()
-        
+        # Validate form fields in one schema pass
+        try:
+            form = SearchForm.model_validate(request.form.to_dict())
+        except ValidationError as validation_error:
+            return jsonify({"error": first_error(validation_error)}), 400
+
+        text_query = form.text
+        num_text_results = form.num_text_results
+
         # Get image data if provided
-        image_data = None
-        if 'image' in request.files:
-            file = request.files['image']
-            if file.filename != '':
-                # Check file type
-                allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
-                if '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
-                    image_data = file.read()
-                    if len(image_data) == 0:
-                        return jsonify({"error": "Empty image file"}), 400
-                else:
-                    return jsonify({"error": "Invalid image file type. Supported formats: png, jpg, jpeg, gif, bmp, webp"}), 400
-        
+        image_data, image_hash, image_error = read_image_form_field()
+        if image_error is not None:
+            return image_error
+
         # Validate that at least one search method is provided
         if not text_query and not image_data:
             return jsonify({"error": "Must provide either 'text' query or 'image' file (or both)"}), 400
-        
-        # Get optional parameters
-        num_text_results = request.form.get('num_text_results', 10, type=int)
-        if num_text_results > 20:  # Rate limiting
-            num_text_results = 20
-        
+
         logger.info(f"Deep search request: text='{text_query[:50] if text_query else 'None'}...', image={'Yes' if image_data else 'No'}")
-        
-        # Perform comprehensive deep search
-        results = deep_search(
-            image_data=image_data,
-            text_query=text_query if text_query else None,
-            num_text_results=num_text_results
-        )
-        
+
+        # Repeat searches for the same inputs short-circuit in the cache;
+        # concurrent identical ones coalesce behind a single computation
+        results = cached_deep_search(text_query, image_data, image_hash, num_text_results)
+
         logger.info(f"Deep search completed: {results.get('total_results', 0)} results processed")
         return jsonify(results), 200
         
@@ -172,98 +334,202 @@ def deep_search_endpoint():
         logger.error(f"Deep search error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+def parse_claude_analysis(analysis):
+    """
+    Parse Claude's response (format: scoreANDexplanation) into a
+    (risk_score, explanation) pair. Falls back to the whole response
+    as the explanation when parsing fails.
+    """
+    try:
+        parts = analysis.split("AND", 1)  # Split on first "AND" only
+        if len(parts) == 2:
+            risk_score = parts[0].strip()
+            explanation = parts[1].strip()
+
+            # Try to convert risk_score to integer
+            try:
+                risk_score = int(risk_score)
+            except ValueError:
+                # If conversion fails, keep as string
+                pass
+            return risk_score, explanation
+
+        # If parsing fails, use the whole response as explanation
+        return "unknown", analysis
+    except Exception as parse_error:
+        logger.warning(f"Failed to parse Claude response: {parse_error}")
+        return "unknown", analysis
+
 @app.route('/analyze-summaries', methods=['POST'])
 def analyze_summaries_endpoint():
     """
     Comprehensive analysis endpoint that performs deep search and Claude analysis in one call.
     """
     try:
-        # Get prompt from form data
-        prompt = request.form.get('prompt', '').strip()
-        if not prompt:
-            return jsonify({"error": "Request must include 'prompt' field"}), 400
-        
-        # Get text query if provided
-        text_query = request.form.get('text', '').strip()
-        
+        # Validate form fields in one schema pass
+        try:
+            form = AnalyzeForm.model_validate(request.form.to_dict())
+        except ValidationError as validation_error:
+            return jsonify({"error": first_error(validation_error)}), 400
+
+        prompt = form.prompt
+        text_query = form.text
+        num_text_results = form.num_text_results
+
         # Get image data if provided
-        image_data = None
-        if 'image' in request.files:
-            file = request.files['image']
-            if file.filename != '':
-                # Check file type
-                allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
-                if '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
-                    image_data = file.read()
-                    if len(image_data) == 0:
-                        return jsonify({"error": "Empty image file"}), 400
-                else:
-                    return jsonify({"error": "Invalid image file type. Supported formats: png, jpg, jpeg, gif, bmp, webp"}), 400
-        
+        image_data, image_hash, image_error = read_image_form_field()
+        if image_error is not None:
+            return image_error
+
         # Validate that at least one search method is provided
         if not text_query and not image_data:
             return jsonify({"error": "Must provide either 'text' query or 'image' file (or both)"}), 400
-        
-        # Get optional parameters
-        num_text_results = request.form.get('num_text_results', 10, type=int)
-        if num_text_results > 20:  # Rate limiting
-            num_text_results = 20
-        
+
         logger.info(f"Analysis request: prompt='{prompt[:50]}...', text='{text_query[:50] if text_query else 'None'}...', image={'Yes' if image_data else 'No'}")
-        
-        # Step 1: Perform deep search
-        summaries_data = deep_search(
-            image_data=image_data,
-            text_query=text_query if text_query else None,
-            num_text_results=num_text_results
-        )
-        
+
+        stream_requested = request.form.get('stream', '').lower() in ('1', 'true', 'yes')
+
+        # Short-circuit a repeat of the exact same analysis. Streaming
+        # requests skip this: the cached object has the non-streaming JSON
+        # shape, and a streaming client expects plain text followed by the
+        # raw summaries on a final line.
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        analysis_key = ('analyze-summaries', prompt_hash, text_query, image_hash, num_text_results)
+        if not stream_requested:
+            cached = cache_get(analysis_key)
+            if cached is not None:
+                logger.info("Analysis cache hit")
+                return jsonify(cached), 200
+
+        # Step 1: Perform deep search. The cache key is shared with
+        # /deep-search, and single-flight locking coalesces concurrent
+        # identical requests (e.g. the 5-prompt test driver firing in
+        # parallel) into one search instead of five.
+        summaries_data = cached_deep_search(text_query, image_data, image_hash, num_text_results)
+
         # Check if deep search found results
         if "error" in summaries_data:
             return jsonify(summaries_data), 404
-        
+
+        # Streaming mode: forward Claude's analysis chunk by chunk so the
+        # client sees first bytes immediately, then append the raw summaries
+        # as compact JSON on a final line.
+        if stream_requested:
+            def generate(summaries_data=summaries_data):
+                for chunk in analyze_with_claude_stream(prompt, summaries_data):
+                    yield chunk
+                yield "\n" + orjson.dumps(summaries_data).decode()
+
+            logger.info("Streaming analysis response")
+            return Response(stream_with_context(generate()), mimetype='text/plain')
+
         # Step 2: Analyze with Claude
         analysis = analyze_with_claude(prompt, summaries_data)
         
         logger.info("Analysis completed successfully")
-        
+
         # Parse Claude's response (format: scoreANDexplanation)
-        try:
-            parts = analysis.split("AND", 1)  # Split on first "AND" only
-            if len(parts) == 2:
-                risk_score = parts[0].strip()
-                explanation = parts[1].strip()
-                
-                # Try to convert risk_score to integer
-                try:
-                    risk_score = int(risk_score)
-                except ValueError:
-                    # If conversion fails, keep as string
-                    pass
-            else:
-                # If parsing fails, use the whole response as explanation
-                risk_score = "unknown"
-                explanation = analysis
-        except Exception as parse_error:
-            logger.warning(f"Failed to parse Claude response: {parse_error}")
-            risk_score = "unknown"
-            explanation = analysis
-        
+        risk_score, explanation = parse_claude_analysis(analysis)
+
         # Format response as JSON with three top-level keys
-        import json
         response_data = {
             "risk_score": risk_score,
             "explanation": explanation,
             "raw_summaries": summaries_data
         }
-        
-        # Return the JSON response
-        return jsonify(response_data), 200
+
+        cache_set(analysis_key, response_data)
+
+        # Encode the (potentially large) response body once and hand Flask
+        # pre-encoded bytes with an explicit Content-Length, skipping the
+        # Response-assembly work jsonify would redo.
+        body = orjson.dumps(response_data)
+        return Response(
+            body,
+            status=200,
+            mimetype='application/json',
+            headers={'Content-Length': str(len(body))},
+            direct_passthrough=True
+        )
         
     except Exception as e:
         logger.error(f"Analysis error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/analyze-summaries-batch', methods=['POST'])
+def analyze_summaries_batch_endpoint():
+    """
+    Batch analysis endpoint: performs one deep search, then evaluates multiple
+    prompts against it in a single Anthropic Message Batches call (half the
+    cost and one round-trip instead of one Claude call per prompt).
+    """
+    try:
+        # Get prompts as a JSON array in the 'prompts' form field
+        prompts_raw = request.form.get('prompts', '').strip()
+        if not prompts_raw:
+            return jsonify({"error": "Request must include 'prompts' field (JSON array of strings)"}), 400
+
+        try:
+            prompts = BatchPrompts(prompts=orjson.loads(prompts_raw)).prompts
+        except ValueError as validation_error:
+            if isinstance(validation_error, ValidationError):
+                return jsonify({"error": first_error(validation_error)}), 400
+            return jsonify({"error": "'prompts' must be a valid JSON array of strings"}), 400
+
+        # Validate the shared form fields in one schema pass
+        try:
+            form = SearchForm.model_validate(request.form.to_dict())
+        except ValidationError as validation_error:
+            return jsonify({"error": first_error(validation_error)}), 400
+
+        text_query = form.text
+        num_text_results = form.num_text_results
+
+        # Get image data if provided
+        image_data, image_hash, image_error = read_image_form_field()
+        if image_error is not None:
+            return image_error
+
+        # Validate that at least one search method is provided
+        if not text_query and not image_data:
+            return jsonify({"error": "Must provide either 'text' query or 'image' file (or both)"}), 400
+
+        logger.info(f"Batch analysis request: {len(prompts)} prompts, text='{text_query[:50] if text_query else 'None'}...', image={'Yes' if image_data else 'No'}")
+
+        # Step 1: Perform deep search once for all prompts, through the
+        # same shared cache (and single-flight lock) as the sibling
+        # endpoints so an identical earlier search is reused here and this
+        # result serves later requests
+        summaries_data = cached_deep_search(text_query, image_data, image_hash, num_text_results)
+
+        # Check if deep search found results
+        if "error" in summaries_data:
+            return jsonify(summaries_data), 404
+
+        # Step 2: Analyze all prompts in one Claude batch
+        analyses = analyze_with_claude_batch(prompts, summaries_data)
+
+        logger.info(f"Batch analysis completed: {len(analyses)} results")
+
+        # Format one result per prompt plus the shared raw summaries
+        results = []
+        for prompt, analysis in zip(prompts, analyses):
+            risk_score, explanation = parse_claude_analysis(analysis)
+            results.append({
+                "prompt": prompt,
+                "risk_score": risk_score,
+                "explanation": explanation
+            })
+
+        return jsonify({
+            "results": results,
+            "raw_summaries": summaries_data
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Batch analysis error: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.errorhandler(413)
 def too_large(e):
     """Handle file too large error"""
@@ -280,6 +546,11 @@ def internal_error(e):
     logger.error(f"Internal server error: {str(e)}")
     return jsonify({"error": "Internal server error"}), 500
 
+# ASGI entry point so the app can run under an async server
+# (e.g. `uvicorn app:asgi_app`). Requests are handled in a thread pool,
+# so slow upstream API calls no longer block the event loop.
+asgi_app = WsgiToAsgi(app)
+
 # Only run with debug in development
 if __name__ == '__main__':
     # This will only run in development
@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration for production deployments.
+
+The endpoints are I/O-bound (Google, FaceCheck, Gemini, and Claude API
+calls), so threaded workers let each process keep many requests in flight
+while waiting on upstream responses. Start with:
+
+    gunicorn -c gunicorn_conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+
+# 2*CPU+1 processes, each with a pool of request threads. gthread (rather
+# than gevent) keeps us compatible with the ThreadPoolExecutors and the
+# anthropic/google SDK clients without monkey-patching.
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * multiprocessing.cpu_count() + 1))
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Deep search can legitimately take a while (page fetches + summaries)
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound any slow memory growth
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
@@ -12,6 +12,16 @@ import sys
 import json
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def _loads(data):
+        return json.loads(data)
 
 def test_claude_trustworthiness_analysis(text_query=None, image_path=None, num_text_results=10, api_url="https://bouncer-backend-t8m1.onrender.com"):
     """
@@ -36,22 +46,27 @@ def test_claude_trustworthiness_analysis(text_query=None, image_path=None, num_t
     print(f"Number of text results: {num_text_results}")
     print("-" * 60)
     
-    # Prepare files for analysis endpoint
-    files = {}
+    # Read the image once so each concurrent request gets its own bytes
+    image_bytes = None
     if image_path:
         if not os.path.exists(image_path):
             print(f"Error: Image file '{image_path}' not found.")
             return
-        
+
         # Check if file is a valid image format
         valid_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
         file_ext = os.path.splitext(image_path)[1].lower()
         if file_ext not in valid_extensions:
             print(f"Warning: '{file_ext}' might not be a supported image format.")
             print(f"Supported formats: {', '.join(valid_extensions)}")
-        
-        files['image'] = open(image_path, 'rb')
-    
+
+        with open(image_path, 'rb') as image_file:
+            image_bytes = image_file.read()
+
+    # One pooled session for all requests: reuses the TCP/TLS connection
+    # instead of a fresh handshake per prompt
+    session = requests.Session()
+
     try:
         print("Performing integrated deep search + Claude analysis...")
         analysis_endpoint = f"{api_url}/analyze-summaries"
@@ -80,11 +95,7 @@ def test_claude_trustworthiness_analysis(text_query=None, image_path=None, num_t
             }
         ]
         
-        for i, test_case in enumerate(test_prompts, 1):
-            print(f"\n--- Test {i}: {test_case['description']} ---")
-            print(f"Risk Guidelines: {test_case['prompt']}")
-            print("-" * 40)
-            
+        def run_test_case(test_case):
             # Prepare the request data
             data = {
                 'prompt': test_case['prompt'],
@@ -92,63 +103,137 @@ def test_claude_trustworthiness_analysis(text_query=None, image_path=None, num_t
             }
             if text_query:
                 data['text'] = text_query
-            
-            # Reset file pointer for each request
-            if files.get('image'):
-                files['image'].seek(0)
-            
-            try:
-                # Make the integrated analysis request
-                response = requests.post(
-                    analysis_endpoint,
-                    data=data,
-                    files=files
-                )
-                
-                print(f"Status Code: {response.status_code}")
-                
-                if response.status_code == 200:
-                    trustworthiness_score = response.text.strip()
-                    print(f"SUCCESS! Trustworthiness Score: {trustworthiness_score}")
-                    
-                    # Validate the output format
-                    try:
-                        score_float = float(trustworthiness_score)
-                        if 0.0 <= score_float <= 1.0:
-                            print(f"✅ Valid score format (0-1 range)")
-                            if score_float >= 0.8:
-                                print("📈 HIGH TRUSTWORTHINESS")
-                            elif score_float >= 0.5:
-                                print("📊 MODERATE TRUSTWORTHINESS")
+
+            files = {}
+            if image_bytes is not None:
+                files['image'] = (os.path.basename(image_path), image_bytes)
+
+            # Make the integrated analysis request
+            return session.post(analysis_endpoint, data=data, files=files)
+
+        # The 5 analyses are independent - fire them concurrently and
+        # print the results in order as they land
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(run_test_case, tc) for tc in test_prompts]
+
+            for i, (test_case, future) in enumerate(zip(test_prompts, futures), 1):
+                print(f"\n--- Test {i}: {test_case['description']} ---")
+                print(f"Risk Guidelines: {test_case['prompt']}")
+                print("-" * 40)
+
+                try:
+                    response = future.result()
+
+                    print(f"Status Code: {response.status_code}")
+
+                    if response.status_code == 200:
+                        trustworthiness_score = response.text.strip()
+                        print(f"SUCCESS! Trustworthiness Score: {trustworthiness_score}")
+
+                        # Validate the output format
+                        try:
+                            score_float = float(trustworthiness_score)
+                            if 0.0 <= score_float <= 1.0:
+                                print(f"✅ Valid score format (0-1 range)")
+                                if score_float >= 0.8:
+                                    print("📈 HIGH TRUSTWORTHINESS")
+                                elif score_float >= 0.5:
+                                    print("📊 MODERATE TRUSTWORTHINESS")
+                                else:
+                                    print("📉 LOW TRUSTWORTHINESS")
                             else:
-                                print("📉 LOW TRUSTWORTHINESS")
-                        else:
-                            print(f"⚠️  Score out of range (should be 0-1)")
-                    except ValueError:
-                        print(f"❌ Invalid score format (should be floating point number)")
-                        
-                else:
-                    print("ERROR! Response:")
-                    try:
-                        error_data = response.json()
-                        print(json.dumps(error_data, indent=2))
-                    except:
-                        print(response.text)
-                        
-            except requests.exceptions.RequestException as e:
-                print(f"Request error: {e}")
-            except Exception as e:
-                print(f"Unexpected error: {e}")
-            
-            print("=" * 60)
-                
+                                print(f"⚠️  Score out of range (should be 0-1)")
+                        except ValueError:
+                            print(f"❌ Invalid score format (should be floating point number)")
+
+                    else:
+                        print("ERROR! Response:")
+                        try:
+                            error_data = _loads(response.content)
+                            print(json.dumps(error_data, indent=2))
+                        except:
+                            print(response.text)
+
+                except requests.exceptions.RequestException as e:
+                    print(f"Request error: {e}")
+                except Exception as e:
+                    print(f"Unexpected error: {e}")
+
+                print("=" * 60)
+
+    except requests.exceptions.ConnectionError:
+        print(f"Error: Could not connect to {api_url}")
+        print("Make sure your Flask server is running!")
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+    finally:
+        session.close()
+
+def test_claude_batch_analysis(text_query=None, image_path=None, num_text_results=10, api_url="https://bouncer-backend-t8m1.onrender.com"):
+    """
+    Test the batch analysis endpoint: one deep search + all risk prompts
+    evaluated in a single Anthropic Message Batches call.
+    """
+
+    if not text_query and not image_path:
+        print("Error: Must provide either text query or image path (or both)")
+        return
+
+    print("="*60)
+    print("CLAUDE BATCH TRUSTWORTHINESS ANALYSIS TESTER")
+    print("="*60)
+    print(f"Text query: {text_query or 'None'}")
+    print(f"Image path: {image_path or 'None'}")
+    print(f"Number of text results: {num_text_results}")
+    print("-" * 60)
+
+    prompts = [
+        "Criminal background checks and legal issues are high risk. Professional employment and education are low risk.",
+        "Multiple social media accounts with suspicious activity are high risk. Verified professional profiles are low risk.",
+        "Dark web presence and data breaches are high risk. Clean background with no security issues is low risk.",
+        "Financial fraud and bankruptcy are high risk. Stable employment and good credit are low risk.",
+        "Fake identities and inconsistent information are high risk. Consistent verified information is low risk."
+    ]
+
+    files = {}
+    if image_path:
+        if not os.path.exists(image_path):
+            print(f"Error: Image file '{image_path}' not found.")
+            return
+        files['image'] = open(image_path, 'rb')
+
+    try:
+        data = {
+            'prompts': json.dumps(prompts),
+            'num_text_results': num_text_results
+        }
+        if text_query:
+            data['text'] = text_query
+
+        print(f"Submitting {len(prompts)} prompts in one batch request...")
+        response = requests.post(f"{api_url}/analyze-summaries-batch", data=data, files=files)
+
+        print(f"Status Code: {response.status_code}")
+        if response.status_code == 200:
+            json_response = response.json()
+            for i, result in enumerate(json_response.get('results', []), 1):
+                print(f"\n--- Result {i} ---")
+                print(f"Prompt: {result['prompt']}")
+                print(f"Risk Score: {result['risk_score']}")
+                print(f"Explanation: {result['explanation']}")
+        else:
+            print("ERROR! Response:")
+            try:
+                print(json.dumps(response.json(), indent=2))
+            except:
+                print(response.text)
+
     except requests.exceptions.ConnectionError:
         print(f"Error: Could not connect to {api_url}")
         print("Make sure your Flask server is running!")
     except Exception as e:
         print(f"Unexpected error: {e}")
     finally:
-        # Close any open files
         for file in files.values():
             if hasattr(file, 'close'):
                 file.close()
@@ -207,7 +292,8 @@ def main():
     parser.add_argument('--image', type=str, help='Path to image file for face search')
     parser.add_argument('--num-results', type=int, default=10, help='Number of text search results (default: 10)')
     parser.add_argument('--api-url', type=str, default='https://bouncer-backend-t8m1.onrender.com', help='API base URL (default: https://bouncer-backend-t8m1.onrender.com)')
-    
+    parser.add_argument('--batch', action='store_true', help='Send all prompts in one request to /analyze-summaries-batch')
+
     args = parser.parse_args()
     
     if not args.text and not args.image:
@@ -219,13 +305,21 @@ def main():
         print("  python test_claude_analysis.py --text 'john.doe@email.com' --image person.jpg")
         sys.exit(1)
     
-    test_claude_trustworthiness_analysis(
-        text_query=args.text,
-        image_path=args.image,
-        num_text_results=args.num_results,
-        api_url=args.api_url
-    )
-    
+    if args.batch:
+        test_claude_batch_analysis(
+            text_query=args.text,
+            image_path=args.image,
+            num_text_results=args.num_results,
+            api_url=args.api_url
+        )
+    else:
+        test_claude_trustworthiness_analysis(
+            text_query=args.text,
+            image_path=args.image,
+            num_text_results=args.num_results,
+            api_url=args.api_url
+        )
+
     show_usage_example()
 
 if __name__ == "__main__":
@@ -8,10 +8,13 @@ Usage:
 """
 
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 import sys
 import json
+import mimetypes
 import os
 import argparse
+from contextlib import nullcontext
 
 def test_deep_search_api(text_query=None, image_path=None, num_text_results=10, api_url="http://localhost:5001"):
     """
@@ -30,79 +33,84 @@ def test_deep_search_api(text_query=None, image_path=None, num_text_results=10,
     
     endpoint = f"{api_url}/deep-search"
     
-    # Prepare form data
-    data = {'num_text_results': num_text_results}
+    # Prepare form data (MultipartEncoder requires string field values)
+    fields = {'num_text_results': str(num_text_results)}
     if text_query:
-        data['text'] = text_query
-    
-    # Prepare files
-    files = {}
+        fields['text'] = text_query
+
+    # Validate the image path up front
     if image_path:
         if not os.path.exists(image_path):
             print(f"Error: Image file '{image_path}' not found.")
             return
-        
+
         # Check if file is a valid image format
         valid_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
         file_ext = os.path.splitext(image_path)[1].lower()
         if file_ext not in valid_extensions:
             print(f"Warning: '{file_ext}' might not be a supported image format.")
             print(f"Supported formats: {', '.join(valid_extensions)}")
-        
-        files['image'] = open(image_path, 'rb')
-    
+
     try:
-        print("="*60)
-        print("DEEP SEARCH API TESTER")
-        print("="*60)
-        print(f"Text query: {text_query or 'None'}")
-        print(f"Image path: {image_path or 'None'}")
-        print(f"Number of text results: {num_text_results}")
-        print(f"API endpoint: {endpoint}")
-        print("-" * 50)
+        # The context manager owns the file handle; nullcontext stands in
+        # when there's no image so the body reads the same either way
+        with (open(image_path, 'rb') if image_path else nullcontext()) as image_file:
+            if image_file is not None:
+                content_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+                fields['image'] = (os.path.basename(image_path), image_file, content_type)
+
+            print("="*60)
+            print("DEEP SEARCH API TESTER")
+            print("="*60)
+            print(f"Text query: {text_query or 'None'}")
+            print(f"Image path: {image_path or 'None'}")
+            print(f"Number of text results: {num_text_results}")
+            print(f"API endpoint: {endpoint}")
+            print("-" * 50)
         
-        # Make the API request
-        response = requests.post(endpoint, data=data, files=files)
+            # Stream the upload so large images are never fully buffered in memory
+            encoder = MultipartEncoder(fields=fields)
+            response = requests.post(endpoint, data=encoder, headers={'Content-Type': encoder.content_type})
         
-        # Print response status
-        print(f"Status Code: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        print("-" * 50)
+            # Print response status
+            print(f"Status Code: {response.status_code}")
+            print(f"Response Headers: {dict(response.headers)}")
+            print("-" * 50)
         
-        # Print the JSON response
-        if response.status_code == 200:
-            json_response = response.json()
-            print("SUCCESS! API Response:")
-            print(json.dumps(json_response, indent=2))
+            # Print the JSON response
+            if response.status_code == 200:
+                json_response = response.json()
+                print("SUCCESS! API Response:")
+                print(json.dumps(json_response, indent=2))
             
-            # Additional formatted output
-            if 'summaries' in json_response:
-                print("\n" + "="*60)
-                print("DEEP SEARCH RESULTS:")
-                print("="*60)
-                print(f"Total results: {json_response.get('total_results', 0)}")
-                print(f"Face search results: {json_response.get('face_search_count', 0)}")
-                print(f"Text search results: {json_response.get('text_search_count', 0)}")
-                print("-" * 60)
+                # Additional formatted output
+                if 'summaries' in json_response:
+                    print("\n" + "="*60)
+                    print("DEEP SEARCH RESULTS:")
+                    print("="*60)
+                    print(f"Total results: {json_response.get('total_results', 0)}")
+                    print(f"Face search results: {json_response.get('face_search_count', 0)}")
+                    print(f"Text search results: {json_response.get('text_search_count', 0)}")
+                    print("-" * 60)
                 
-                for i, result in enumerate(json_response['summaries'], 1):
-                    print(f"\nResult {i} ({result['source']}):")
-                    print(f"  Title: {result['title']}")
-                    print(f"  Link: {result['link']}")
-                    if result.get('snippet'):
-                        print(f"  Snippet: {result['snippet']}")
-                    print(f"  Summary: {result['summary']}")
-                    print("-" * 40)
-            else:
-                print("No summaries found in response.")
+                    for i, result in enumerate(json_response['summaries'], 1):
+                        print(f"\nResult {i} ({result['source']}):")
+                        print(f"  Title: {result['title']}")
+                        print(f"  Link: {result['link']}")
+                        if result.get('snippet'):
+                            print(f"  Snippet: {result['snippet']}")
+                        print(f"  Summary: {result['summary']}")
+                        print("-" * 40)
+                else:
+                    print("No summaries found in response.")
                 
-        else:
-            print("ERROR! API Response:")
-            try:
-                error_response = response.json()
-                print(json.dumps(error_response, indent=2))
-            except:
-                print(response.text)
+            else:
+                print("ERROR! API Response:")
+                try:
+                    error_response = response.json()
+                    print(json.dumps(error_response, indent=2))
+                except:
+                    print(response.text)
                 
     except requests.exceptions.ConnectionError:
         print(f"Error: Could not connect to {api_url}")
@@ -111,11 +119,6 @@ def test_deep_search_api(text_query=None, image_path=None, num_text_results=10,
         print(f"Request error: {e}")
     except Exception as e:
         print(f"Unexpected error: {e}")
-    finally:
-        # Close any open files
-        for file in files.values():
-            if hasattr(file, 'close'):
-                file.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Test the deep search API endpoint")
@@ -5,8 +5,10 @@ Usage: python test_face_search.py <image_path>
 """
 
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 import sys
 import json
+import mimetypes
 import os
 
 def test_face_search_api(image_path, api_url="http://localhost:5001"):
@@ -34,17 +36,20 @@ def test_face_search_api(image_path, api_url="http://localhost:5001"):
     endpoint = f"{api_url}/face-search"
     
     try:
-        # Prepare the files for the request
+        # Stream the upload so the image is never fully buffered in memory
         with open(image_path, 'rb') as image_file:
-            files = {'image': image_file}
-            
+            content_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+            encoder = MultipartEncoder(fields={
+                'image': (os.path.basename(image_path), image_file, content_type)
+            })
+
             print(f"Uploading image: {image_path}")
             print(f"Searching for top 3 most similar faces...")
             print(f"API endpoint: {endpoint}")
             print("-" * 50)
-            
+
             # Make the API request
-            response = requests.post(endpoint, files=files)
+            response = requests.post(endpoint, data=encoder, headers={'Content-Type': encoder.content_type})
             
             # Print response status
             print(f"Status Code: {response.status_code}")
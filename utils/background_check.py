@@ -1,61 +1,168 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import argparse
+import json
 import os
-import google.generativeai as genai
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import urllib.parse
 import urllib.request
+import urllib.robotparser
 import base64
-import tempfile
-import anthropic
+import io
+import hashlib
+import heapq
+import html
 import logging
-from dotenv import load_dotenv
+import re
+import threading
+from functools import lru_cache
+from cachetools import TTLCache
+from utils.config import CONFIG
+from utils.rate_limit import call_with_backoff, limiter_from_env
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env file
-load_dotenv()
-
 # Clean up any proxy-related environment variables that might interfere
 for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
     if proxy_var in os.environ:
         logger.warning(f"Removing proxy environment variable: {proxy_var}")
         del os.environ[proxy_var]
 
-CUSTOM_SEARCH_API = os.getenv("CUSTOM-SEARCH-API")
-SEARCH_ENGINE_ID = os.getenv("SEARCH-ENGINE-ID")
-GEMINI_API = os.getenv("GEMINI-API")
-CLAUDE_API_KEY = os.getenv("CLAUDE-API-KEY")  # Add your Claude API key to .env file
-
 # Facecheck.id configuration
 FACECHECK_TESTING_MODE = False
-FACECHECK_APITOKEN = os.getenv("FACECHECK-API-TOKEN")
 
-genai.configure(api_key=GEMINI_API)
+# The google-generativeai and anthropic SDKs are imported lazily (see
+# _get_gemini_model / _get_claude_client below) so that workers which only
+# serve /rs or /face-search never pay their import time or memory.
+
+@lru_cache(maxsize=1)
+def _get_gemini_model():
+    """Lazily import, configure, and memoize the Gemini model client."""
+    import google.generativeai as genai
+    genai.configure(api_key=CONFIG.gemini_api)
+    return genai.GenerativeModel('models/gemini-2.0-flash')
+
+@lru_cache(maxsize=1)
+def _get_claude_client():
+    """Lazily import and memoize the Anthropic client."""
+    import anthropic
+    return anthropic.Anthropic(api_key=CONFIG.claude_api_key)
+
+# One pooled session for all outbound HTTP. Connection keep-alive avoids a
+# fresh TCP+TLS handshake per call (repeat hits to googleapis.com,
+# facecheck.id, and result pages reuse sockets), and transient upstream
+# errors are retried with backoff. Retries only apply to idempotent
+# methods, so FaceCheck uploads are never double-submitted.
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+)
+_SESSION = requests.Session()
+_SESSION.mount("https://", _HTTP_ADAPTER)
+_SESSION.mount("http://", _HTTP_ADAPTER)
+# Advertise brotli alongside gzip: urllib3 decodes br transparently once the
+# brotli package is installed, and br-served HTML runs 20-30% smaller
+_SESSION.headers['Accept-Encoding'] = 'gzip, deflate, br'
+
+# Shared executor for the face/text legs of deep_search. Module-level
+# singleton so we don't pay thread-pool startup on every request, and sized
+# for the whole process (two legs x the gunicorn thread count), not one
+# request's two legs: a face leg can hold a worker for the full FaceCheck
+# poll (minutes), and an undersized pool would queue every other request's
+# legs behind it.
+_SEARCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=2 * int(os.getenv('GUNICORN_THREADS', '8')),
+    thread_name_prefix="search"
+)
+
+# Bounded pool for the per-page fetches in deep_search. The bound keeps us
+# from hammering upstream sites with unbounded concurrency when a search
+# returns many links; summarization runs on its own pool below.
+_PAGE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="page")
+
+# Gemini summarization gets its own pool: its rate limits differ from
+# outbound page fetches, and sharing one pool would let slow LLM calls
+# occupy workers that fast fetches need (or vice versa). Sized to the
+# Gemini limiter so threads do work rather than queue on it.
+_SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarize")
+
+# Small pool for paginated Google Custom Search fetches; the cap keeps us
+# within CSE's per-second quota.
+_CSE_EXECUTOR = ThreadPoolExecutor(max_workers=5, thread_name_prefix="cse")
+
+# Per-provider concurrency/pacing gates. RPMs are tunable via env vars so
+# deployments on higher API tiers can raise them without a code change.
+_GEMINI_LIMITER = limiter_from_env('gemini', 'GEMINI_RPM', 60, max_concurrency=8)
+_CLAUDE_LIMITER = limiter_from_env('claude', 'CLAUDE_RPM', 60, max_concurrency=4)
+_CSE_LIMITER = limiter_from_env('cse', 'CSE_RPM', 100, max_concurrency=5)
 
 def rs(text, num_results=10):
     """
     Perform a Google Custom Search for pages containing the given text.
+    Results are cached per (text, num_results); repeated queries skip the
+    external API call entirely. Returns fresh dict copies so callers can
+    annotate results without corrupting the cache.
     """
-    if not CUSTOM_SEARCH_API or not SEARCH_ENGINE_ID:
+    return [dict(item) for item in _rs_cached(text, num_results)]
+
+@lru_cache(maxsize=1024)
+def _rs_cached(text, num_results):
+    if not CONFIG.custom_search_api or not CONFIG.search_engine_id:
         raise Exception("Google Custom Search API credentials not configured")
-    
-    url = "https://www.googleapis.com/customsearch/v1"
+
+    # Google CSE returns at most 10 results per page; fetch all needed
+    # pages concurrently so latency is one round-trip, not one per page
+    starts = list(range(1, num_results + 1, 10))
+    if len(starts) == 1:
+        pages = [_fetch_cse_page(text, 1, min(num_results, 10))]
+    else:
+        futures = [
+            _CSE_EXECUTOR.submit(_fetch_cse_page, text, start, min(10, num_results - (start - 1)))
+            for start in starts
+        ]
+        pages = [future.result() for future in futures]
+
+    results = [item for page in pages for item in page]
+    logger.info(f"Text search completed: {len(results)} results for query '{text[:50]}...'")
+    return results
+
+_CSE_URL = "https://www.googleapis.com/customsearch/v1"
+_CSE_BASE_PARAMS = {
+    "key": CONFIG.custom_search_api,
+    "cx": CONFIG.search_engine_id,
+}
+
+def _search_query(text):
+    """
+    Build the CSE query string. intext: forces a body-text match, which
+    often returns zero results for short names — an empty page that still
+    costs a quota unit — so short queries go out plain.
+    """
+    return f"intext:{text}" if len(text.split()) >= 3 else text
+
+def _fetch_cse_page(text, start, num):
+    """Fetch a single Google Custom Search results page."""
     params = {
-        "key": CUSTOM_SEARCH_API,
-        "cx": SEARCH_ENGINE_ID,
-        "q": f"intext:{text}",
-        "num": min(num_results, 10)  # Google API limit
+        **_CSE_BASE_PARAMS,
+        "q": _search_query(text),
+        "num": num,  # Google API limit: 10 per page
+        "start": start
     }
-    
+
     try:
-        response = requests.get(url, params=params, timeout=30)
+        with _CSE_LIMITER:
+            response = _SESSION.get(_CSE_URL, params=params, timeout=30)
         response.raise_for_status()
         data = response.json()
-        
+
         if 'error' in data:
             raise Exception(f"Google API Error: {data['error'].get('message', 'Unknown error')}")
-        
+
         results = []
         for item in data.get("items", []):
             results.append({
@@ -63,16 +170,215 @@ def rs(text, num_results=10):
                 "link": item.get("link"),
                 "snippet": item.get("snippet")
             })
-        
-        logger.info(f"Text search completed: {len(results)} results for query '{text[:50]}...'")
+
         return results
-        
+
     except requests.exceptions.RequestException as e:
         logger.error(f"Google Search API request failed: {str(e)}")
         raise Exception(f"Search request failed: {str(e)}")
 
-import requests
-from bs4 import BeautifulSoup
+# How many page excerpts to bundle into one Gemini call, and the per-doc
+# character cap that keeps a batched prompt inside the context budget.
+_SUMMARY_BATCH_SIZE = 5
+_BATCH_EXCERPT_CHAR_LIMIT = 4000
+
+# Per-excerpt cap in UTF-8 bytes. Line counts are a poor proxy for Gemini's
+# token budget (500 nav stubs vs 500 paragraphs differ ~20x in tokens);
+# ~4 bytes per token is a serviceable approximation for web text, so this
+# holds each excerpt near 6K tokens regardless of line lengths.
+_EXCERPT_BYTE_LIMIT = 6000 * 4
+
+# Stop downloading a result page beyond this many bytes; the excerpt cap
+# above means the rest would be fetched, parsed, and thrown away.
+_PAGE_BYTE_LIMIT = 512 * 1024
+
+# Don't bother fetching pages that declare a Content-Length past this;
+# anything that large is a data dump, not an article.
+_PAGE_SKIP_BYTE_LIMIT = 2_000_000
+
+# Per-host fetch gate: the page pool already bounds total concurrency, but
+# a result set dominated by one domain (e.g. 20 twitter.com links) would
+# still aim every worker at that host at once and invite rate limiting or
+# an IP ban. At most this many fetches run against the same host.
+_PER_HOST_FETCH_LIMIT = 3
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+def _host_semaphore(link):
+    """Return the shared fetch semaphore for the link's host."""
+    host = urllib.parse.urlparse(link).netloc
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.Semaphore(_PER_HOST_FETCH_LIMIT)
+            _host_semaphores[host] = semaphore
+    return semaphore
+
+# robots.txt verdicts are cached per host so each host's file is fetched
+# at most once per process, not once per link on that host.
+@lru_cache(maxsize=256)
+def _robots_for_host(origin):
+    """Fetch and parse robots.txt for an origin like 'https://example.com'."""
+    parser = urllib.robotparser.RobotFileParser()
+    try:
+        resp = _SESSION.get(f"{origin}/robots.txt", timeout=5)
+        if resp.ok:
+            parser.parse(resp.text.splitlines())
+        else:
+            # Missing or broken robots.txt means no restrictions
+            parser.parse([])
+    except Exception:
+        parser.parse([])
+    return parser
+
+def _robots_allows(link):
+    """Check whether the host's robots.txt permits fetching the link."""
+    parsed = urllib.parse.urlparse(link)
+    return _robots_for_host(f"{parsed.scheme}://{parsed.netloc}").can_fetch('*', link)
+
+# Per-URL summary cache: the same links show up across queries (and across
+# the face/text legs of one query), and each costs a page fetch plus a paid
+# Gemini call to re-summarize. Page content is slow-moving, so a week of
+# reuse is safe.
+_summary_cache = TTLCache(maxsize=2048, ttl=7 * 86400)
+_summary_cache_lock = threading.Lock()
+
+# Visible-text extraction is a compiled-regex pipeline rather than a DOM
+# parse: the excerpt only feeds LLM summarization, so stripping
+# script/style/comment blocks and tags is enough, and it avoids building
+# (and immediately discarding) a full node tree per page. Malformed HTML
+# degrades the text slightly; that's acceptable for summarization input.
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style)[^>]*>.*?</\1>", re.I | re.S)
+# Boilerplate containers — navigation, page chrome, forms — that dilute the
+# excerpt with menu items and footer links. Dropping them keeps the line
+# budget for the main content, which is what Gemini should summarize.
+_BOILERPLATE_RE = re.compile(r"<(nav|header|footer|aside|form|noscript|svg)[^>]*>.*?</\1>", re.I | re.S)
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+def _extract_visible_text(html_text):
+    """Strip markup from an HTML document, keeping roughly the main text."""
+    stripped = _SCRIPT_STYLE_RE.sub("", html_text)
+    stripped = _BOILERPLATE_RE.sub("", stripped)
+    stripped = _COMMENT_RE.sub("", stripped)
+    text = _TAG_RE.sub("\n", stripped)
+    text = html.unescape(text)
+    return _BLANK_LINES_RE.sub("\n", text).strip()
+
+def _fetch_page_excerpt(item):
+    """
+    Fetch a single search result's page and extract a text excerpt.
+    Returns (excerpt, error): exactly one of the two is None.
+    """
+    try:
+        logger.info(f"Processing link: {item['link']}")
+
+        if not _robots_allows(item['link']):
+            logger.info(f"Skipping {item['link']}: disallowed by robots.txt")
+            return None, "Skipped: disallowed by robots.txt"
+
+        # Download the page with better error handling
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+        # Stream the body and stop once we have more than enough for the
+        # excerpt, instead of downloading arbitrarily large pages in full.
+        # The per-host semaphore keeps concurrent fetches to any one domain
+        # bounded even when most results point at the same site.
+        with _host_semaphore(item['link']):
+            with _SESSION.get(item['link'], timeout=15, headers=headers, allow_redirects=True, stream=True) as resp:
+                resp.raise_for_status()
+                # Check the Content-Type before pulling the body: PDFs,
+                # images, and video would be garbage to the text extractor
+                # and a wasted Gemini call, so skip them without downloading
+                content_type = resp.headers.get('Content-Type', '')
+                if content_type and not content_type.startswith(('text/html', 'application/xhtml', 'text/plain')):
+                    logger.info(f"Skipping non-HTML content at {item['link']} ({content_type})")
+                    return None, f"Skipped non-HTML content ({content_type.split(';')[0]})"
+                # A declared size far past the download cap marks a bulk
+                # page (exports, dumps) not worth reading even partially
+                content_length = int(resp.headers.get('Content-Length') or 0)
+                if content_length > _PAGE_SKIP_BYTE_LIMIT:
+                    logger.info(f"Skipping oversized page at {item['link']} ({content_length} bytes)")
+                    return None, f"Skipped oversized page ({content_length} bytes)"
+                encoding = resp.encoding or 'utf-8'
+                buf = bytearray()
+                for chunk in resp.iter_content(64 * 1024):
+                    buf.extend(chunk)
+                    if len(buf) >= _PAGE_BYTE_LIMIT:
+                        break
+
+        text = _extract_visible_text(bytes(buf).decode(encoding, errors='replace'))
+        # Truncate on the byte budget; decode with 'ignore' so a cut
+        # mid-character can't raise
+        excerpt = text.encode('utf-8')[:_EXCERPT_BYTE_LIMIT].decode('utf-8', 'ignore')
+
+        if not excerpt.strip():
+            raise Exception("No readable content found")
+
+        return excerpt, None
+
+    except Exception as e:
+        logger.warning(f"Failed to process {item['link']}: {e}")
+        return None, str(e)
+
+def _summarize_excerpt(model, excerpt):
+    """Summarize a single page excerpt with Gemini."""
+    prompt = (
+        "Here is some page content:\n\n"
+        f"{excerpt}\n\n"
+        "Please write a concise, one-paragraph summary of the above."
+    )
+
+    try:
+        response = call_with_backoff(model.generate_content, prompt, limiter=_GEMINI_LIMITER)
+        return response.text.strip() if response.text else "No summary generated"
+    except Exception as gemini_error:
+        logger.warning(f"Gemini API error: {gemini_error}")
+        return "Summary generation failed"
+
+def _summarize_batch(model, batch):
+    """
+    Summarize several page excerpts in one Gemini call instead of one call
+    per page. Takes a list of (index, excerpt) pairs and returns
+    {index: summary}. Falls back to per-excerpt calls if the model's JSON
+    response can't be parsed.
+    """
+    if len(batch) == 1:
+        index, excerpt = batch[0]
+        return {index: _summarize_excerpt(model, excerpt)}
+
+    documents = "\n\n".join(
+        f"[{n}]\n{excerpt[:_BATCH_EXCERPT_CHAR_LIMIT]}"
+        for n, (_, excerpt) in enumerate(batch, 1)
+    )
+    prompt = (
+        "Below are several numbered documents of page content.\n"
+        "For each one, write a concise, one-paragraph summary.\n"
+        'Respond with only a JSON array like [{"id": 1, "summary": "..."}] '
+        "containing one entry per document.\n\n"
+        f"{documents}"
+    )
+
+    try:
+        response = call_with_backoff(model.generate_content, prompt, limiter=_GEMINI_LIMITER)
+        payload = response.text.strip() if response.text else ""
+
+        # Strip markdown code fences if the model added them
+        if payload.startswith("```"):
+            payload = payload.split("\n", 1)[1] if "\n" in payload else ""
+            payload = payload.rsplit("```", 1)[0].strip()
+
+        parsed = {int(entry["id"]): str(entry["summary"]).strip() for entry in json.loads(payload)}
+        if set(parsed) != set(range(1, len(batch) + 1)):
+            raise ValueError("batch response is missing document summaries")
+
+        return {index: parsed[n] for n, (index, _) in enumerate(batch, 1)}
+
+    except Exception as batch_error:
+        logger.warning(f"Batched summarization failed, falling back to per-page calls: {batch_error}")
+        return {index: _summarize_excerpt(model, excerpt) for index, excerpt in batch}
 
 def deep_search(image_data=None, text_query=None, num_text_results=10):
     """
@@ -87,13 +393,23 @@ def deep_search(image_data=None, text_query=None, num_text_results=10):
     Returns:
         Combined summaries from both face search and text search results
     """
-    model = genai.GenerativeModel('models/gemini-2.0-flash')
+    model = _get_gemini_model()
     all_results = []
-    
-    # 1. Perform face search if image provided
+
+    # 1. Launch face search and text search concurrently - they hit
+    # independent external APIs, so overlapping them means the combined
+    # search phase takes max(face, text) instead of face + text.
+    face_future = None
+    text_future = None
     if image_data:
+        face_future = _SEARCH_EXECUTOR.submit(face_search_formatted, image_data)
+    if text_query:
+        text_future = _SEARCH_EXECUTOR.submit(rs, text_query, num_text_results)
+
+    # 2. Collect results from both legs
+    if face_future:
         try:
-            face_results = face_search_formatted(image_data)
+            face_results = face_future.result()
             # Add source type to distinguish results
             for result in face_results:
                 result['source'] = 'face_search'
@@ -101,11 +417,10 @@ def deep_search(image_data=None, text_query=None, num_text_results=10):
             logger.info(f"Face search found {len(face_results)} results")
         except Exception as e:
             logger.error(f"Face search failed: {e}")
-    
-    # 2. Perform text search if query provided
-    if text_query:
+
+    if text_future:
         try:
-            text_results = rs(text_query, num_results=num_text_results)
+            text_results = text_future.result()
             # Add source type to distinguish results
             for result in text_results:
                 result['source'] = 'text_search'
@@ -118,99 +433,93 @@ def deep_search(image_data=None, text_query=None, num_text_results=10):
         logger.warning("No results found from either search method")
         return {"error": "No results found from either search method"}
     
-    # 3. Remove duplicate links
-    seen_links = set()
-    unique_results = []
+    # 3. Remove duplicate links (first occurrence wins)
+    deduped = {}
     for item in all_results:
-        if item['link'] not in seen_links:
-            seen_links.add(item['link'])
-            unique_results.append(item)
+        deduped.setdefault(item['link'], item)
+    unique_results = list(deduped.values())
     
     logger.info(f"Processing {len(unique_results)} unique links for deep search...")
-    
-    # 4. Perform deep search on all unique results
-    summaries = []
-    for i, item in enumerate(unique_results, 1):
-        try:
-            logger.info(f"Processing link {i}/{len(unique_results)}: {item['link']}")
-            
-            # Download the page with better error handling
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            resp = requests.get(item['link'], timeout=15, headers=headers, allow_redirects=True)
-            resp.raise_for_status()
-
-            # Extract visible text
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-            
-            text = soup.get_text(separator='\n', strip=True)
-            excerpt = '\n'.join(text.splitlines()[:500])  # first ~500 lines to stay under context limit
-
-            if not excerpt.strip():
-                raise Exception("No readable content found")
-
-            # Build a targeted prompt
-            prompt = (
-                "Here is some page content:\n\n"
-                f"{excerpt}\n\n"
-                "Please write a concise, one-paragraph summary of the above."
-            )
-
-            # Generate the summary with error handling
-            try:
-                response = model.generate_content(prompt)
-                summary = response.text.strip() if response.text else "No summary generated"
-            except Exception as gemini_error:
-                logger.warning(f"Gemini API error for {item['link']}: {gemini_error}")
-                summary = "Summary generation failed"
-
-            summaries.append({
-                "title": item['title'],
-                "link": item['link'],
-                "snippet": item.get('snippet', ''),
-                "source": item['source'],
-                "summary": summary
-            })
-            
-        except Exception as e:
-            logger.warning(f"Failed to process {item['link']}: {e}")
-            summaries.append({
-                "title": item['title'],
-                "link": item['link'],
-                "snippet": item.get('snippet', ''),
-                "source": item['source'],
-                "summary": f"Failed to retrieve summary: {str(e)}"
-            })
 
+    # 4. Reuse recent summaries where we have them, then fetch the rest
+    # concurrently. Each worker handles its own failures so one bad link
+    # can't sink the batch.
+    with _summary_cache_lock:
+        summary_by_index = {
+            i: _summary_cache[item['link']]
+            for i, item in enumerate(unique_results) if item['link'] in _summary_cache
+        }
+    if summary_by_index:
+        logger.info(f"Summary cache hit for {len(summary_by_index)}/{len(unique_results)} links")
+
+    to_process = [(i, item) for i, item in enumerate(unique_results) if i not in summary_by_index]
+    fetched = list(_PAGE_EXECUTOR.map(_fetch_page_excerpt, [item for _, item in to_process]))
+
+    # 5. Summarize the excerpts a few per Gemini call, batches in parallel
+    pending = []
+    for (i, _), (excerpt, error) in zip(to_process, fetched):
+        if error is not None:
+            # Skip notices (non-HTML content) already read as summaries;
+            # real fetch failures get the failure prefix
+            if error.startswith("Skipped"):
+                summary_by_index[i] = error
+            else:
+                summary_by_index[i] = f"Failed to retrieve summary: {error}"
+        else:
+            pending.append((i, excerpt))
+
+    batches = [pending[j:j + _SUMMARY_BATCH_SIZE] for j in range(0, len(pending), _SUMMARY_BATCH_SIZE)]
+    for future in [_SUMMARY_EXECUTOR.submit(_summarize_batch, model, batch) for batch in batches]:
+        summary_by_index.update(future.result())
+
+    # Cache the fresh summaries that actually succeeded
+    with _summary_cache_lock:
+        for i, _ in pending:
+            summary = summary_by_index.get(i)
+            if summary and summary != "Summary generation failed":
+                _summary_cache[unique_results[i]['link']] = summary
+
+    summaries = [
+        {
+            "title": item['title'],
+            "link": item['link'],
+            "snippet": item.get('snippet', ''),
+            "source": item['source'],
+            "summary": summary_by_index[i]
+        }
+        for i, item in enumerate(unique_results)
+    ]
+
+    counts = Counter(s['source'] for s in summaries)
     return {
         "total_results": len(summaries),
-        "face_search_count": len([s for s in summaries if s['source'] == 'face_search']),
-        "text_search_count": len([s for s in summaries if s['source'] == 'text_search']),
+        "face_search_count": counts.get('face_search', 0),
+        "text_search_count": counts.get('text_search', 0),
         "summaries": summaries
     }
 
-def search_by_face(image_file_path):
+def search_by_face(image_source):
     """
-    Perform reverse image search using facecheck.id
+    Perform reverse image search using facecheck.id.
+    Accepts either a path to an image file or the raw image bytes.
     """
-    if not FACECHECK_APITOKEN:
+    if not CONFIG.facecheck_api_token:
         raise Exception("Facecheck API token not configured")
-    
+
     if FACECHECK_TESTING_MODE:
         logger.info('Running in TESTING MODE - results are inaccurate, but credits are NOT deducted')
 
     site = 'https://facecheck.id'
-    headers = {'accept': 'application/json', 'Authorization': FACECHECK_APITOKEN}
-    
+    headers = {'accept': 'application/json', 'Authorization': CONFIG.facecheck_api_token}
+
     try:
-        with open(image_file_path, 'rb') as f:
-            files = {'images': f, 'id_search': None}
-            response = requests.post(site + '/api/upload_pic', headers=headers, files=files, timeout=30).json()
+        if isinstance(image_source, (bytes, bytearray)):
+            f = io.BytesIO(image_source)
+        else:
+            f = open(image_source, 'rb')
+        with f:
+            files = {'images': ('image.jpg', f), 'id_search': None}
+            response = _SESSION.post(site + '/api/upload_pic', headers=headers, files=files, timeout=30).json()
 
         if response['error']:
             raise Exception(f"{response['error']} ({response['code']})")
@@ -219,62 +528,126 @@ def search_by_face(image_file_path):
         logger.info(f"Face search initiated: {response['message']} id_search={id_search}")
         json_data = {'id_search': id_search, 'with_progress': True, 'status_only': False, 'demo': FACECHECK_TESTING_MODE}
 
-        # Add timeout to prevent infinite loops
-        max_attempts = 60  # 60 seconds max
-        attempts = 0
-        
-        while attempts < max_attempts:
-            response = requests.post(site + '/api/search', headers=headers, json=json_data, timeout=30).json()
+        # Poll with exponential backoff instead of a fixed 1-second sleep:
+        # FaceCheck queues commonly take tens of seconds, so tight polling
+        # mostly burns API calls without finishing any sooner.
+        timeout_seconds = 300
+        deadline = time.time() + timeout_seconds
+        delay = 1.0
+
+        while time.time() < deadline:
+            response = _SESSION.post(site + '/api/search', headers=headers, json=json_data, timeout=30).json()
             if response['error']:
                 raise Exception(f"{response['error']} ({response['code']})")
             if response['output']:
                 logger.info(f"Face search completed: {len(response['output']['items'])} results found")
                 return response['output']['items']
-            
+
             logger.info(f"Face search progress: {response['progress']}%")
-            time.sleep(1)
-            attempts += 1
-        
-        raise Exception("Face search timed out after 60 seconds")
+            time.sleep(min(delay, max(0.0, deadline - time.time())))
+            delay = min(delay * 1.5, 8.0)
+
+        raise Exception(f"Face search timed out after {timeout_seconds} seconds")
         
     except requests.exceptions.RequestException as e:
         logger.error(f"Facecheck API request failed: {str(e)}")
         raise Exception(f"Face search request failed: {str(e)}")
 
+# Process-wide cache of formatted face-search results keyed by image hash,
+# shared across /face-search and deep_search callers. Repeat lookups of the
+# same image are answered locally instead of paying another multi-second
+# (and credit-consuming) FaceCheck round-trip.
+_face_result_cache = TTLCache(maxsize=256, ttl=3600)
+_face_result_cache_lock = threading.Lock()
+
 def face_search_formatted(image_data, num_results=3):
     """
     Wrapper function for face search that handles image data and formats results
     consistently with the existing API format.
     Returns the top 3 most similar faces sorted by similarity score.
     """
-    # Create a temporary file to store the uploaded image
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-        temp_file.write(image_data)
-        temp_file_path = temp_file.name
+    image_hash = hashlib.sha256(image_data).hexdigest()
+    with _face_result_cache_lock:
+        cached = _face_result_cache.get(image_hash)
+    if cached is not None:
+        logger.info(f"Face search cache hit for image {image_hash[:12]}")
+        return [dict(r) for r in cached]
 
-    try:
-        # Perform the face search
-        raw_results = search_by_face(temp_file_path)
-        
-        # Sort results by similarity score in descending order (highest scores first)
-        sorted_results = sorted(raw_results, key=lambda x: x['score'], reverse=True)
-        
-        # Format results to match existing API structure, taking top 3 most similar
-        results = []
-        for i, item in enumerate(sorted_results[:3]):  # Always take top 3 most similar
-            results.append({
-                "title": f"Face Match (Score: {item['score']}%)",
-                "link": item['url'],
-                "snippet": f"Face similarity score: {item['score']}% - Found on webpage"
-            })
-        
-        return results
-        
-    finally:
-        # Clean up temporary file
-        import os
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+    # Perform the face search straight from the in-memory bytes
+    raw_results = search_by_face(image_data)
+
+    # Pick the top matches by similarity score; nlargest avoids sorting the
+    # full result set just to keep a handful of entries
+    top_results = heapq.nlargest(num_results, raw_results, key=lambda x: x['score'])
+
+    # Format results to match existing API structure
+    results = []
+    for item in top_results:
+        results.append({
+            "title": f"Face Match (Score: {item['score']}%)",
+            "link": item['url'],
+            "snippet": f"Face similarity score: {item['score']}% - Found on webpage"
+        })
+
+    with _face_result_cache_lock:
+        _face_result_cache[image_hash] = [dict(r) for r in results]
+    return results
+
+# Character caps for the Claude analysis context. Claude's cost and latency
+# scale with input tokens, so oversized fields are clipped and the context
+# stops growing past ~40K chars (roughly 10K tokens). These are cost/latency
+# knobs, not correctness limits.
+_CONTEXT_FIELD_CHAR_LIMIT = 800
+_CONTEXT_TOTAL_CHAR_LIMIT = 40000
+
+def _context_field(value, limit=_CONTEXT_FIELD_CHAR_LIMIT):
+    """Coerce a context field to a capped string ('N/A' when missing)."""
+    return str(value)[:limit] if value else 'N/A'
+
+def _build_claude_prompt(prompt, summaries_data):
+    """
+    Build the full analysis prompt for Claude from the user's prompt
+    and the deep_search summaries.
+    """
+    # Prepare the context from summaries; collected in a list and joined
+    # once, rather than rebuilding a growing string per result
+    parts = []
+    total = 0
+
+    for i, result in enumerate(summaries_data.get('summaries', []), 1):
+        part = f"""
+Result {i} (Source: {result.get('source', 'unknown')}):
+- Title: {_context_field(result.get('title'))}
+- Link: {_context_field(result.get('link'))}
+- Original Snippet: {_context_field(result.get('snippet'))}
+- AI Summary: {_context_field(result.get('summary'))}
+---
+"""
+        total += len(part)
+        if total > _CONTEXT_TOTAL_CHAR_LIMIT:
+            parts.append(f"\n[Context truncated after {i - 1} results to stay within the analysis budget]\n")
+            break
+        parts.append(part)
+
+    context = "".join(parts)
+
+    # Only the dynamic part goes in the user message; the static
+    # instructions live in _ANALYSIS_SYSTEM_PROMPT
+    return f"""
+{context}
+
+User's Analysis Request:
+{prompt}
+"""
+
+# Static scoring instructions, sent as the system prompt on every analysis
+# call so the per-request user message carries only the dynamic context.
+_ANALYSIS_SYSTEM_PROMPT = """You are an expert analyst reviewing the trustworthiness of a person based on the search results where 0 is most trustworthy and 100 is least trustworthy, rounded to the ones digit. Do not output any other text/letters besides a number.
+As for strict guidelines, you must base your output number on the User's Analysis Request based on what the user deems more risky and less risky pieces of information.
+
+After providing the numerical score, add "AND" and then provide a brief explanation (2-3 sentences) of why you assigned this specific risk score based on the evidence found in the search results.
+
+Format your response exactly as: <number>AND<explanation>"""
 
 def analyze_with_claude(prompt, summaries_data):
     """
@@ -287,53 +660,22 @@ def analyze_with_claude(prompt, summaries_data):
     Returns:
         str: Claude's analysis text response
     """
-    if not CLAUDE_API_KEY:
+    if not CONFIG.claude_api_key:
         raise Exception("Claude API key not found. Please set CLAUDE-API-KEY in your .env file")
     
-    try:
-        # Initialize Claude client with explicit parameters only
-        client = anthropic.Anthropic(
-            api_key=CLAUDE_API_KEY,
-            # Don't pass any proxy or other parameters that might cause issues
-        )
-    except Exception as init_error:
-        logger.error(f"Failed to initialize Claude client: {init_error}")
-        raise Exception(f"Claude client initialization failed: {str(init_error)}")
-    
-    # Prepare the context from summaries
-    context = ""
-    
-    for i, result in enumerate(summaries_data.get('summaries', []), 1):
-        context += f"""
-Result {i} (Source: {result.get('source', 'unknown')}):
-- Title: {result.get('title', 'N/A')}
-- Link: {result.get('link', 'N/A')}
-- Original Snippet: {result.get('snippet', 'N/A')}
-- AI Summary: {result.get('summary', 'N/A')}
----
-"""
+    client = _get_claude_client()
     
-    # Create the full prompt for Claude
-    full_prompt = f"""
-You are an expert analyst reviewing the trustworthiness of a person based on the search results where 0 is most trustworthy and 100 is least trustworthy, rounded to the ones digit. Do not output any other text/letters besides a number.
-As for strict guidelines, you must base your output number on the User's Analysis Request based on what the user deems more risky and less risky pieces of information. 
-
-After providing the numerical score, add "AND" and then provide a brief explanation (2-3 sentences) of why you assigned this specific risk score based on the evidence found in the search results.
-
-Format your response exactly as: <number>AND<explanation>
-
-{context}
+    full_prompt = _build_claude_prompt(prompt, summaries_data)
 
-User's Analysis Request:
-{prompt}
-"""
-    
     try:
         # Call Claude Sonnet (use Claude 3.5 Sonnet which is more stable)
-        response = client.messages.create(
+        response = call_with_backoff(
+            client.messages.create,
+            limiter=_CLAUDE_LIMITER,
             model="claude-sonnet-4-20250514",  # Claude 3.5 Sonnet (more stable)
-            max_tokens=1000,  # Reduced for simple numeric response
+            max_tokens=300,  # Score plus a 2-3 sentence explanation fits well within this
             temperature=0.1,  # Low temperature for more focused analysis
+            system=_ANALYSIS_SYSTEM_PROMPT,
             messages=[
                 {
                     "role": "user",
@@ -354,6 +696,139 @@ User's Analysis Request:
         logger.error(f"Claude API call failed: {str(e)}")
         raise Exception(f"Claude API error: {str(e)}")
 
+# Small pool for fanning independent Claude analyses out in parallel;
+# sized to the limiter's concurrency cap so threads never just queue on it.
+_CLAUDE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="claude")
+
+def analyze_with_claude_many(prompts, summaries_data):
+    """
+    Run several independent Claude analyses over the same summaries
+    concurrently. Lower latency than analyze_with_claude_batch for a
+    handful of prompt variations (no batch queueing), at normal per-token
+    cost; the shared limiter keeps total concurrency within quota.
+
+    Args:
+        prompts (list[str]): Analysis prompts to evaluate against the summaries
+        summaries_data (dict): JSON output from deep_search function
+
+    Returns:
+        list[str]: Claude's analysis text for each prompt, in prompt order
+    """
+    futures = [
+        _CLAUDE_EXECUTOR.submit(analyze_with_claude, prompt, summaries_data)
+        for prompt in prompts
+    ]
+    return [future.result() for future in futures]
+
+def analyze_with_claude_stream(prompt, summaries_data):
+    """
+    Streaming variant of analyze_with_claude: yields Claude's analysis text
+    chunk by chunk as it is generated, so callers can start forwarding bytes
+    to the client instead of waiting for the full response.
+
+    Args:
+        prompt (str): User's analysis prompt/question
+        summaries_data (dict): JSON output from deep_search function
+
+    Yields:
+        str: Incremental pieces of Claude's analysis text
+    """
+    if not CONFIG.claude_api_key:
+        raise Exception("Claude API key not found. Please set CLAUDE-API-KEY in your .env file")
+
+    client = _get_claude_client()
+
+    full_prompt = _build_claude_prompt(prompt, summaries_data)
+
+    try:
+        with _CLAUDE_LIMITER, client.messages.stream(
+            model="claude-sonnet-4-20250514",
+            max_tokens=300,
+            temperature=0.1,
+            system=_ANALYSIS_SYSTEM_PROMPT,
+            messages=[
+                {
+                    "role": "user",
+                    "content": full_prompt
+                }
+            ]
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+        logger.info("Claude streaming analysis completed")
+
+    except Exception as e:
+        logger.error(f"Claude streaming API call failed: {str(e)}")
+        raise Exception(f"Claude API error: {str(e)}")
+
+def analyze_with_claude_batch(prompts, summaries_data, poll_interval=5, timeout=600):
+    """
+    Analyze the deep search summaries against multiple prompts in a single
+    call using the Anthropic Message Batches API (half the per-token cost
+    of individual calls and one round-trip instead of N).
+
+    Args:
+        prompts (list[str]): Analysis prompts to evaluate against the summaries
+        summaries_data (dict): JSON output from deep_search function
+        poll_interval (int): Seconds between batch status polls
+        timeout (int): Max seconds to wait for the batch to finish
+
+    Returns:
+        list[str]: Claude's analysis text for each prompt, in prompt order
+    """
+    if not CONFIG.claude_api_key:
+        raise Exception("Claude API key not found. Please set CLAUDE-API-KEY in your .env file")
+
+    client = _get_claude_client()
+
+    batch_requests = [
+        {
+            "custom_id": f"prompt-{i}",
+            "params": {
+                "model": "claude-sonnet-4-20250514",
+                "max_tokens": 300,
+                "temperature": 0.1,
+                "system": _ANALYSIS_SYSTEM_PROMPT,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": _build_claude_prompt(prompt, summaries_data)
+                    }
+                ]
+            }
+        }
+        for i, prompt in enumerate(prompts)
+    ]
+
+    try:
+        batch = call_with_backoff(client.messages.batches.create, limiter=_CLAUDE_LIMITER, requests=batch_requests)
+        logger.info(f"Claude batch submitted: {batch.id} ({len(prompts)} prompts)")
+
+        # Poll until the batch finishes processing
+        deadline = time.time() + timeout
+        while batch.processing_status != "ended":
+            if time.time() > deadline:
+                raise Exception(f"Claude batch {batch.id} timed out after {timeout} seconds")
+            time.sleep(poll_interval)
+            batch = client.messages.batches.retrieve(batch.id)
+
+        # Collect per-prompt results keyed by custom_id
+        results_by_id = {}
+        for entry in client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                results_by_id[entry.custom_id] = entry.result.message.content[0].text.strip()
+            else:
+                logger.warning(f"Claude batch entry {entry.custom_id} failed: {entry.result.type}")
+                results_by_id[entry.custom_id] = f"Analysis failed: {entry.result.type}"
+
+        logger.info(f"Claude batch completed: {batch.id}")
+        return [results_by_id.get(f"prompt-{i}", "Analysis failed: missing result")
+                for i in range(len(prompts))]
+
+    except Exception as e:
+        logger.error(f"Claude batch API call failed: {str(e)}")
+        raise Exception(f"Claude batch API error: {str(e)}")
+
 def main():
     # testing
     parser = argparse.ArgumentParser(description="Search Google Custom Search for any text.")
@@ -0,0 +1,32 @@
+"""
+Process-wide configuration for the external API credentials.
+
+The .env file is parsed exactly once, at first import, and the resolved
+secrets are frozen into an immutable dataclass. Hot paths then read plain
+attributes instead of hitting the environment hash on every access, and
+slots=True drops the per-instance __dict__ for a compact layout.
+"""
+
+import os
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Immutable snapshot of the API credentials read from the environment."""
+    custom_search_api: str | None
+    search_engine_id: str | None
+    gemini_api: str | None
+    claude_api_key: str | None
+    facecheck_api_token: str | None
+
+CONFIG = Config(
+    custom_search_api=os.getenv("CUSTOM-SEARCH-API"),
+    search_engine_id=os.getenv("SEARCH-ENGINE-ID"),
+    gemini_api=os.getenv("GEMINI-API"),
+    claude_api_key=os.getenv("CLAUDE-API-KEY"),
+    facecheck_api_token=os.getenv("FACECHECK-API-TOKEN"),
+)
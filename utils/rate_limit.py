@@ -0,0 +1,79 @@
+"""
+Rate limiting helpers for the external API clients (Gemini, Claude,
+Google Custom Search).
+
+Each provider enforces requests-per-minute quotas, and the thread pools in
+utils.background_check can otherwise burst well past them; tripping a 429
+costs far more than pacing the calls in the first place.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Bounded-concurrency, paced gate for calls to one external API.
+
+    Combines a semaphore capping in-flight calls with a minimum interval
+    between call starts, so bursts from the thread pools stay inside the
+    provider's documented requests-per-minute limit. Use as a context
+    manager around each call.
+    """
+
+    def __init__(self, name, rpm, max_concurrency):
+        self.name = name
+        self._min_interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        if self._min_interval:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._next_start - now
+                self._next_start = max(now, self._next_start) + self._min_interval
+            if wait > 0:
+                time.sleep(wait)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._semaphore.release()
+        return False
+
+def is_rate_limit_error(error):
+    """
+    Best-effort detection of provider rate-limit/quota errors without
+    importing the (lazily loaded) SDKs.
+    """
+    if error.__class__.__name__ in ('RateLimitError', 'ResourceExhausted', 'TooManyRequests'):
+        return True
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message or 'quota' in message or 'resource exhausted' in message
+
+def call_with_backoff(func, *args, limiter=None, attempts=3, base_delay=1.0, max_delay=30.0, **kwargs):
+    """
+    Invoke func under an optional RateLimiter, retrying rate-limit errors
+    with exponential backoff. Non-rate-limit errors propagate immediately.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            if limiter is not None:
+                with limiter:
+                    return func(*args, **kwargs)
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts or not is_rate_limit_error(e):
+                raise
+            delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+            logger.warning(f"Rate limited ({limiter.name if limiter else 'unknown'}), retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+
+def limiter_from_env(name, rpm_var, default_rpm, max_concurrency):
+    """Build a RateLimiter whose RPM can be tuned via an environment variable."""
+    return RateLimiter(name, rpm=int(os.getenv(rpm_var, str(default_rpm))), max_concurrency=max_concurrency)
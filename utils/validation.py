@@ -0,0 +1,75 @@
+"""
+Pydantic schemas for the request data each endpoint accepts.
+
+Validation used to be hand-rolled per handler (strip / type / range checks
+spread across four or five separate 400 branches); these compiled models do
+it in a single pass in pydantic's Rust core and produce uniform error
+messages.
+"""
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+__all__ = ['RsRequest', 'SearchForm', 'AnalyzeForm', 'BatchPrompts', 'ValidationError', 'first_error']
+
+class RsRequest(BaseModel):
+    """JSON body for POST /rs."""
+    text: str
+    num_results: int = 10
+
+    @field_validator('text')
+    @classmethod
+    def text_not_blank(cls, value):
+        if not value.strip():
+            raise ValueError("Text query cannot be empty")
+        return value
+
+    @field_validator('num_results')
+    @classmethod
+    def clamp_num_results(cls, value):
+        # Rate limiting: clamp rather than reject, matching the old handlers
+        return max(1, min(value, 20))
+
+class SearchForm(BaseModel):
+    """Shared form fields for the deep-search and analysis endpoints."""
+    text: str = ''
+    num_text_results: int = 10
+
+    @field_validator('text')
+    @classmethod
+    def strip_text(cls, value):
+        return value.strip()
+
+    @field_validator('num_text_results')
+    @classmethod
+    def clamp_num_text_results(cls, value):
+        # Rate limiting: clamp rather than reject, matching the old handlers
+        return max(1, min(value, 20))
+
+class AnalyzeForm(SearchForm):
+    """Form fields for POST /analyze-summaries."""
+    prompt: str = Field(min_length=1)
+
+    @field_validator('prompt')
+    @classmethod
+    def prompt_not_blank(cls, value):
+        if not value.strip():
+            raise ValueError("Request must include 'prompt' field")
+        return value.strip()
+
+class BatchPrompts(BaseModel):
+    """The decoded 'prompts' JSON array for POST /analyze-summaries-batch."""
+    prompts: list[str] = Field(min_length=1)
+
+    @field_validator('prompts')
+    @classmethod
+    def prompts_not_blank(cls, value):
+        if not all(p.strip() for p in value):
+            raise ValueError("'prompts' entries must be non-empty strings")
+        return value
+
+def first_error(error):
+    """Format a ValidationError's first problem as a short 'field: message' string."""
+    problem = error.errors()[0]
+    location = '.'.join(str(part) for part in problem['loc'])
+    message = problem['msg']
+    return f"{location}: {message}" if location else message